@@ -26,6 +26,7 @@ from .shared_memory import (
     MemoryKey,
     PerceptionData,
     ReflectionData,
+    ReflectionMemento,
     ActionData,
 )
 from .browser_adapter import BrowserAdapter, BrowserState
@@ -44,6 +45,7 @@ __all__ = [
     "MemoryKey",
     "PerceptionData",
     "ReflectionData",
+    "ReflectionMemento",
     "ActionData",
     # Browser
     "BrowserAdapter",
@@ -5,9 +5,12 @@ Agents communicate through async message passing using the event bus pattern.
 """
 
 import asyncio
+import time
+from collections import deque
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Set
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
 import logging
 
 logger = logging.getLogger(__name__)
@@ -42,7 +45,7 @@ class MessageType(Enum):
     SYSTEM_ERROR = "system_error"
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentMessage:
     """A message sent between agents."""
 
@@ -50,7 +53,7 @@ class AgentMessage:
     message_type: MessageType
     content: Any
     recipient: Optional[str] = None
-    timestamp: float = field(default_factory=lambda: __import__("time").time())
+    timestamp: float = field(default_factory=time.time)
     metadata: Dict[str, Any] = field(default_factory=dict)
 
     def __str__(self) -> str:
@@ -71,8 +74,9 @@ class EventBus:
     def __init__(self):
         self._subscribers: Dict[MessageType, List[MessageHandler]] = {}
         self._agent_subscribers: Dict[str, List[MessageType]] = {}
-        self._message_history: List[AgentMessage] = []
         self._max_history = 1000
+        # Oldest messages drop off automatically once the history is full
+        self._message_history: Deque[AgentMessage] = deque(maxlen=self._max_history)
         self._lock = asyncio.Lock()
 
     async def publish(self, message: AgentMessage) -> None:
@@ -80,8 +84,6 @@ class EventBus:
         async with self._lock:
             # Add to history
             self._message_history.append(message)
-            if len(self._message_history) > self._max_history:
-                self._message_history.pop(0)
 
         # Get subscribers for this message type
         subscribers = self._subscribers.get(message.message_type, [])
@@ -147,13 +149,20 @@ class EventBus:
         limit: int = 100,
     ) -> List[AgentMessage]:
         """Get message history with optional filtering."""
-        history = self._message_history
+        # Walk newest-first and stop once `limit` matches are collected
+        matches = (
+            m for m in reversed(self._message_history)
+            if (not sender or m.sender == sender)
+            and (not message_type or m.message_type == message_type)
+        )
 
-        if sender:
-            history = [m for m in history if m.sender == sender]
-        if message_type:
-            history = [m for m in history if m.message_type == message_type]
+        if limit > 0:
+            history = list(islice(matches, limit))
+            history.reverse()
+            return history
 
+        history = list(matches)
+        history.reverse()
         return history[-limit:]
 
     def clear_history(self) -> None:
@@ -9,6 +9,7 @@ are passed through step callbacks rather than direct state access.
 """
 
 import asyncio
+import time
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
@@ -20,7 +21,7 @@ from browser_use.browser.views import BrowserStateSummary
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class BrowserState:
     """Current browser state for our agents."""
 
@@ -77,7 +78,7 @@ class BrowserState:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class BrowserAction:
     """An action to execute in the browser."""
 
@@ -101,7 +102,7 @@ class BrowserAction:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class ActionResult:
     """Result of a browser action."""
 
@@ -150,19 +151,17 @@ class BrowserAdapter:
         browser_state: BrowserStateSummary,
         agent_output: Any,
         step: int,
+        url: Optional[str] = None,
     ) -> None:
         """
         Update state from browser-use callback.
 
         This method is called by the step callback from browser-use Agent.
+        Pass url if the caller already fetched it, to skip a second session query.
         """
         try:
-            url = await self.browser_session.get_current_page_url() or ""
-
-            # Store elements from agent output for our agents to use
-            if hasattr(agent_output, 'action') and hasattr(agent_output.action, 'index'):
-                # Track which element was interacted with
-                pass
+            if url is None:
+                url = await self.browser_session.get_current_page_url() or ""
 
             self._current_state = BrowserState.from_browser_state_summary(
                 browser_state,
@@ -206,8 +205,6 @@ class BrowserAdapter:
         Note: This is a stub for future implementation.
         Currently actions are executed by browser-use Agent directly.
         """
-        import time
-
         start_time = time.time()
 
         self._logger.warning(
@@ -7,6 +7,7 @@ while our agents provide enhanced perception, reflection, and planning.
 
 import asyncio
 import logging
+from functools import partialmethod
 from typing import Any, Dict, List, Optional
 from pathlib import Path
 
@@ -29,13 +30,12 @@ logger = logging.getLogger(__name__)
 
 _original_agent_message_prompt_init = AgentMessagePrompt.__init__
 
-def _patched_agent_message_prompt_init(self, *args, **kwargs):
-    """Патченый __init__ с увеличенным лимитом информации о страницы."""
-    if 'max_clickable_elements_length' not in kwargs:
-        kwargs['max_clickable_elements_length'] = 150000  # 150K вместо 40K
-    _original_agent_message_prompt_init(self, *args, **kwargs)
-
-AgentMessagePrompt.__init__ = _patched_agent_message_prompt_init
+# Увеличенный лимит информации о странице: 150K вместо 40K.
+# partialmethod без лишнего Python-фрейма; явно переданный аргумент имеет приоритет.
+AgentMessagePrompt.__init__ = partialmethod(
+    _original_agent_message_prompt_init,
+    max_clickable_elements_length=150000,
+)
 
 
 # =============================================================================
@@ -69,16 +69,16 @@ def _patched_get_user_message(self, *args, **kwargs):
 
     # Инъектируем контекст в UserMessage объект
     # UserMessage может иметь content как строку или список
-    if hasattr(original, 'content'):
-        if isinstance(original.content, str):
-            # Добавляем контекст к строковому контенту
-            original.content = f"{original.content}\n\n{context_str}"
-        elif isinstance(original.content, list):
-            # Добавляем контекст к списку контента (в первый текстовый элемент)
-            for item in original.content:
-                if hasattr(item, 'text'):
-                    item.text = f"{item.text}\n\n{context_str}"
-                    break
+    content = getattr(original, 'content', None)
+    if isinstance(content, str):
+        # Добавляем контекст к строковому контенту
+        original.content = f"{content}\n\n{context_str}"
+    elif isinstance(content, list):
+        # Добавляем контекст к списку контента (в первый текстовый элемент)
+        for item in content:
+            if hasattr(item, 'text'):
+                item.text = f"{item.text}\n\n{context_str}"
+                break
 
     return original
 
@@ -171,6 +171,10 @@ class MultiAgentCoordinator:
         """
         print("\n🤖 Запуск Multi-Agent System")
 
+        # Подсказки прошлой задачи не должны попасть в первый промпт новой
+        global _current_context_hints
+        _current_context_hints = None
+
         # Initialize task
         await self.shared_memory.set(MemoryKey.TASK_DESCRIPTION, task)
         await self.shared_memory.set(MemoryKey.TASK_STATUS, "running")
@@ -234,16 +238,16 @@ class MultiAgentCoordinator:
         self._logger.info(f"{'='*50}")
 
         try:
-            # Update browser adapter with current state
-            await self.browser_adapter.update_from_callback(browser_state, agent_output, step)
-
-            # Get URL from browser session
+            # Get URL from browser session (once - the adapter reuses it)
             url = ""
             try:
                 url = await self.browser_session.get_current_page_url() or ""
             except Exception:
                 pass  # URL might not be available yet
 
+            # Update browser adapter with current state
+            await self.browser_adapter.update_from_callback(browser_state, agent_output, step, url=url)
+
             await self.shared_memory.set(MemoryKey.CURRENT_URL, url)
 
             # Create simplified browser state dict for our agents
@@ -285,7 +289,7 @@ class MultiAgentCoordinator:
                     # Store action result for next step
                     action_result_dict = {
                         "success": True,
-                        "action": str(agent_output.action) if hasattr(agent_output, 'action') else "unknown",
+                        "action": str(getattr(agent_output, 'action', "unknown")),
                     }
                     await self.shared_memory.set(MemoryKey.LAST_ACTION_RESULT, action_result_dict)
 
@@ -314,9 +318,12 @@ class MultiAgentCoordinator:
         patterns = perception.get("patterns", [])
         modal = perception.get("modal_detected", False)
 
-        self._logger.info(f"  [Perception] Page type: {page_type}")
-        self._logger.info(f"  [Perception] Patterns: {', '.join(patterns) if patterns else 'none'}")
-        self._logger.info(f"  [Perception] Modal: {'yes' if modal else 'no'}")
+        # One log record per summary instead of one per line
+        self._logger.info("\n".join([
+            f"  [Perception] Page type: {page_type}",
+            f"  [Perception] Patterns: {', '.join(patterns) if patterns else 'none'}",
+            f"  [Perception] Modal: {'yes' if modal else 'no'}",
+        ]))
 
     def _log_reflection(self, reflection: Dict[str, Any]) -> None:
         """Log reflection summary."""
@@ -327,10 +334,13 @@ class MultiAgentCoordinator:
         progress = reflection.get("progress_score", 0.0)
         next_action = reflection.get("next_action")
 
-        self._logger.info(f"  [Reflection] Last action: {'success' if success else 'failed'}")
-        self._logger.info(f"  [Reflection] Progress: {progress*100:.0f}%")
+        lines = [
+            f"  [Reflection] Last action: {'success' if success else 'failed'}",
+            f"  [Reflection] Progress: {progress*100:.0f}%",
+        ]
         if next_action:
-            self._logger.info(f"  [Reflection] Next: {next_action}")
+            lines.append(f"  [Reflection] Next: {next_action}")
+        self._logger.info("\n".join(lines))
 
     def get_stats(self) -> Dict[str, Any]:
         """Get execution statistics."""
@@ -347,6 +357,7 @@ async def create_coordinator(
     headless: bool = False,
     max_steps: int = 25,
     debug: bool = False,
+    browser_session: Optional[BrowserSession] = None,
 ) -> MultiAgentCoordinator:
     """
     Create a new coordinator with browser session.
@@ -356,14 +367,16 @@ async def create_coordinator(
         headless: Whether to run browser in headless mode
         max_steps: Maximum number of steps to execute
         debug: Enable debug logging
+        browser_session: Existing session to reuse (a new one is created if None)
 
     Returns:
         MultiAgentCoordinator instance
     """
-    browser_session = await create_browser_session(
-        headless=headless,
-        keep_alive=True,
-    )
+    if browser_session is None:
+        browser_session = await create_browser_session(
+            headless=headless,
+            keep_alive=True,
+        )
 
     return MultiAgentCoordinator(
         browser_session=browser_session,
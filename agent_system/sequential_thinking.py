@@ -18,6 +18,9 @@ from .shared_memory import (
 
 logger = logging.getLogger(__name__)
 
+# Sentinel for attributes that may be absent on duck-typed inputs
+_MISSING = object()
+
 
 @dataclass
 class ThinkingContext:
@@ -172,19 +175,22 @@ class SequentialThinkingEngine:
 
         # Analyze previous result
         if previous_result:
-            if hasattr(previous_result, "success"):
-                if previous_result.success:
+            success = getattr(previous_result, "success", _MISSING)
+            if success is not _MISSING:
+                if success:
                     thought_parts.append("Предыдущее действие выполнено успешно")
                 else:
                     thought_parts.append(f"Предыдущее действие не удалось: {previous_result.error}")
                     context.error_count += 1
 
         # Current page context
-        if hasattr(perception, "page_type") and perception.page_type:
-            thought_parts.append(f"Тип страницы: {perception.page_type}")
+        page_type = getattr(perception, "page_type", None)
+        if page_type:
+            thought_parts.append(f"Тип страницы: {page_type}")
 
-        if hasattr(perception, "observations") and perception.observations:
-            thought_parts.append(f"Наблюдения: {', '.join(perception.observations[:3])}")
+        perceived = getattr(perception, "observations", None)
+        if perceived:
+            thought_parts.append(f"Наблюдения: {', '.join(perceived[:3])}")
 
         return ". ".join(thought_parts) + "."
 
@@ -197,30 +203,32 @@ class SequentialThinkingEngine:
         observations = []
 
         # Basic page info
-        if hasattr(perception, "page_type"):
-            observations.append(f"Тип страницы: {perception.page_type or 'неизвестно'}")
+        page_type = getattr(perception, "page_type", _MISSING)
+        if page_type is not _MISSING:
+            observations.append(f"Тип страницы: {page_type or 'неизвестно'}")
 
         # Patterns detected
-        if hasattr(perception, "patterns") and perception.patterns:
-            observations.append(f"Обнаружены паттерны: {', '.join(perception.patterns)}")
+        patterns = getattr(perception, "patterns", None)
+        if patterns:
+            observations.append(f"Обнаружены паттерны: {', '.join(patterns)}")
 
         # Interactive elements
-        if hasattr(perception, "interactive_elements"):
-            count = len(perception.interactive_elements)
-            observations.append(f"Интерактивных элементов: {count}")
+        elements = getattr(perception, "interactive_elements", _MISSING)
+        if elements is not _MISSING:
+            observations.append(f"Интерактивных элементов: {len(elements)}")
 
         # Modal detection
-        if hasattr(perception, "modal_detected") and perception.modal_detected:
+        if getattr(perception, "modal_detected", False):
             observations.append("Обнаружено модальное окно")
 
         # Pagination
-        if hasattr(perception, "pagination_detected") and perception.pagination_detected:
+        if getattr(perception, "pagination_detected", False):
             observations.append("Обнаружена пагинация")
 
         # Forms
-        if hasattr(perception, "forms_detected") and perception.forms_detected:
-            count = len(perception.forms_detected)
-            observations.append(f"Форм на странице: {count}")
+        forms = getattr(perception, "forms_detected", None)
+        if forms:
+            observations.append(f"Форм на странице: {len(forms)}")
 
         return ". ".join(observations) if observations else "Страница загружена"
 
@@ -277,8 +285,9 @@ class SequentialThinkingEngine:
 
         reflections = []
 
-        if hasattr(previous_result, "success"):
-            if previous_result.success:
+        success = getattr(previous_result, "success", _MISSING)
+        if success is not _MISSING:
+            if success:
                 reflections.append("Действие было успешным")
             else:
                 reflections.append(f"Действие не удалось: {previous_result.error}")
@@ -5,9 +5,10 @@ Agents can share context, observations, and results through shared memory.
 """
 
 import asyncio
+import time
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, NamedTuple, Optional, Set
 import logging
 
 logger = logging.getLogger(__name__)
@@ -56,7 +57,7 @@ class MemoryKey(Enum):
     CONTEXT_HINTS = "context_hints"
 
 
-@dataclass
+@dataclass(slots=True)
 class PerceptionData:
     """Data from perception agent."""
 
@@ -82,7 +83,7 @@ class PerceptionData:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class ReflectionData:
     """Data from reflection agent."""
 
@@ -112,14 +113,24 @@ class ReflectionData:
         }
 
 
-@dataclass
+class ReflectionMemento(NamedTuple):
+    """Compact snapshot of a reflection for long-running history."""
+
+    ts: float
+    score: float
+    success: bool
+    page_type: int  # interned page type id
+    error_hash: int  # 0 if there were no errors
+
+
+@dataclass(slots=True)
 class ActionData:
     """Data about an action."""
 
     action_type: str
     target_element: Optional[str] = None
     value: Optional[str] = None
-    timestamp: float = field(default_factory=lambda: __import__("time").time())
+    timestamp: float = field(default_factory=time.time)
     result: Optional[str] = None
     error: Optional[str] = None
     screenshot_before: Optional[str] = None
@@ -136,7 +147,7 @@ class ActionData:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class ThoughtStep:
     """A single step in the thought chain."""
 
@@ -162,7 +173,7 @@ class ThoughtStep:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class ContextHints:
     """
     Контекстные подсказки от агентов (БЕЗ жёстких инструкций!).
@@ -278,9 +289,9 @@ class SharedMemory:
         Returns:
             The value that satisfied the condition
         """
-        start_time = __import__("time").time()
+        start_time = time.time()
 
-        while __import__("time").time() - start_time < timeout:
+        while time.time() - start_time < timeout:
             value = self.get(key)
             if value is not None:
                 if predicate is None or predicate(value):
@@ -10,7 +10,7 @@ Perception Agent - Analyzes page state and detects patterns.
 import asyncio
 import re
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, NamedTuple, Optional
 import logging
 
 from agent_system.agent_base import AgentBase, AgentCapability, AgentConfig
@@ -39,6 +39,85 @@ PERCEPTION_SYSTEM_PROMPT = """
 """
 
 
+def _compile_any(patterns) -> "re.Pattern[str]":
+    """Compile substrings into one alternation regex (single C-level scan)."""
+    return re.compile("|".join(re.escape(p) for p in patterns))
+
+
+# URL-индикаторы типа страницы (в порядке приоритета)
+_URL_INDICATORS = tuple(
+    (page_type, _compile_any(patterns))
+    for page_type, patterns in {
+        "catalog": ["/catalog", "/category", "/products", "/shop", "/store"],
+        "product": ["/product", "/item", "/p/"],
+        "cart": ["/cart", "/basket", "/bag"],
+        "checkout": ["/checkout", "/order", "/payment"],
+        "search": ["/search", "/find", "/q="],
+        "profile": ["/profile", "/account", "/settings"],
+        "login": ["/login", "/signin", "/auth"],
+    }.items()
+)
+
+# Текстовые индикаторы типа страницы (в порядке приоритета)
+_TEXT_INDICATORS = {
+    "cart": ["cart", "basket", "your items", "shopping cart", "korzina", "корзина"],
+    "checkout": ["checkout", "payment", "shipping", "оформление", "оплата"],
+    "product": ["buy", "purchase", "add to", "добавить в корзину"],
+    "catalog": ["catalog", "products", "categories", "каталог"],
+}
+
+# Теги полей ввода и теги, которые категоризируются сами по себе
+_INPUT_TAGS = frozenset({"input", "textarea", "select"})
+_SELF_CATEGORIZED_TAGS = _INPUT_TAGS | {"button", "a"}
+
+# Категоризация элементов (все возможные результаты, кроме "unknown")
+_ELEMENT_CATEGORIES = frozenset({"button", "link", "input", "action_button", "navigation"})
+_BUTTON_CLASS_RE = _compile_any(["button", "btn", "click", "tap", "нажать"])
+_ACTION_TEXT_RE = _compile_any([
+    "add", "buy", "purchase", "order", "cart",
+    "добавить", "купить", "заказать", "в корзину",
+])
+_NAV_TEXT_RE = _compile_any(["next", "prev", "back", "forward", "menu", "далее", "назад"])
+
+# Модальные окна и пагинация
+_MODAL_CLASS_RE = _compile_any(["modal", "dialog", "popup", "overlay", "lightbox"])
+_PAGINATION_TEXT_RE = _compile_any([
+    "next", "prev", "previous", "page", "показать ещё",
+    "load more", "следующая", "предыдущая",
+])
+
+# Паттерны покупки в тексте страницы
+_CART_TEXT_RE = _compile_any(["cart", "basket", "корзина"])
+_CHECKOUT_TEXT_RE = _compile_any(["checkout", "payment", "оформление", "оплата"])
+
+# Индикаторы элементов управления количеством (эвристики, не хардкод!)
+_QUANTITY_INDICATORS_RE = _compile_any([
+    "increase", "decrease", "increment", "decrement",
+    "увеличить", "уменьшить", "плюс", "минус",
+    "quantity", "qty", "count", "количество",
+])
+_QUANTITY_CLASS_RE = _compile_any([
+    "quantity", "qty", "counter", "stepper",
+    "amount", "number-spinner", "qty-selector",
+])
+_QUANTITY_NAV_CLASS_RE = _compile_any(["nav", "menu", "pagination"])
+
+# Кнопки-символы (+, -): точное совпадение, длина проверяется до хеширования
+_QUANTITY_SYMBOLS = frozenset({"+", "-", "+]", "[-", "(+)", "(-)"})
+_QUANTITY_SYMBOLS_MIN_LEN = min(map(len, _QUANTITY_SYMBOLS))
+_QUANTITY_SYMBOLS_MAX_LEN = max(map(len, _QUANTITY_SYMBOLS))
+
+
+class _ElementFeatures(NamedTuple):
+    """Per-element fields shared by the detectors (lowercased once per step)."""
+
+    text: str
+    text_lower: str
+    aria_label_lower: str
+    classes: str  # lowercased class attribute
+    attrs: Dict[str, Any]
+
+
 class PerceptionAgent(AgentBase):
     """
     Agent for perceiving and analyzing browser state.
@@ -67,6 +146,14 @@ class PerceptionAgent(AgentBase):
         super().__init__(config, event_bus, shared_memory)
         self.llm = llm
 
+        # Element features of the last analyzed browser state
+        self._features_state: Optional[Dict[str, Any]] = None
+        self._features: List[_ElementFeatures] = []
+
+        # Last analyzed browser state and its (perception, patterns) result
+        self._last_state: Optional[Dict[str, Any]] = None
+        self._last_analysis: Optional[tuple] = None
+
         # Subscribe to relevant messages
         self._subscribe_to_messages()
 
@@ -99,11 +186,18 @@ class PerceptionAgent(AgentBase):
             return {"success": False, "error": "No browser state"}
 
         try:
-            # Analyze the page
-            perception = await self.perceive_page(browser_state)
+            # Unchanged snapshot (e.g. waiting on a modal) - reuse last analysis
+            if self._last_analysis is not None and browser_state == self._last_state:
+                perception, patterns = self._last_analysis
+            else:
+                # Analyze the page
+                perception = await self.perceive_page(browser_state)
+
+                # Detect patterns (reusing detections from perceive_page)
+                patterns = await self.detect_patterns(browser_state, perception)
 
-            # Detect patterns
-            patterns = await self.detect_patterns(browser_state)
+                self._last_state = browser_state
+                self._last_analysis = (perception, patterns)
 
             # Combine into perception data
             perception_data = PerceptionData(
@@ -117,8 +211,10 @@ class PerceptionAgent(AgentBase):
                 observations=perception.get("observations", []),
             )
 
+            perception_dict = perception_data.to_dict()
+
             # Store in shared memory
-            await self.set_memory(MemoryKey.PERCEPTION_RESULT, perception_data.to_dict())
+            await self.set_memory(MemoryKey.PERCEPTION_RESULT, perception_dict)
             await self.set_memory(MemoryKey.CURRENT_URL, browser_state.get("url", ""))
             await self.set_memory(MemoryKey.PAGE_TITLE, browser_state.get("title", ""))
 
@@ -129,7 +225,7 @@ class PerceptionAgent(AgentBase):
             # Publish perception result
             await self.send_message(
                 MessageType.PERCEPTION_PAGE_ANALYZED,
-                perception_data.to_dict(),
+                perception_dict,
             )
 
             # Publish detected patterns
@@ -143,7 +239,7 @@ class PerceptionAgent(AgentBase):
 
             return {
                 "success": True,
-                "perception": perception_data.to_dict(),
+                "perception": perception_dict,
             }
 
         except Exception as e:
@@ -187,7 +283,7 @@ class PerceptionAgent(AgentBase):
         result["forms_detected"] = await self._detect_forms(browser_state)
 
         # Generate observations
-        result["observations"] = await self._generate_observations(result, url, title)
+        result["observations"] = await self._generate_observations(result)
 
         return result
 
@@ -200,65 +296,70 @@ class PerceptionAgent(AgentBase):
         Uses heuristics based on URL structure, title, and page content.
         """
         url_lower = url.lower()
-        title_lower = title.lower()
-
-        # Get text content from page
-        page_text = self._extract_text_content(browser_state).lower()
-
-        # Analyze URL patterns
-        url_indicators = {
-            "catalog": ["/catalog", "/category", "/products", "/shop", "/store"],
-            "product": ["/product", "/item", "/p/"],
-            "cart": ["/cart", "/basket", "/bag"],
-            "checkout": ["/checkout", "/order", "/payment"],
-            "search": ["/search", "/find", "/q="],
-            "profile": ["/profile", "/account", "/settings"],
-            "login": ["/login", "/signin", "/auth"],
-        }
 
         # Check URL patterns
-        for page_type, patterns in url_indicators.items():
-            if any(pattern in url_lower for pattern in patterns):
+        for page_type, pattern_re in _URL_INDICATORS:
+            if pattern_re.search(url_lower):
                 return page_type
 
-        # Analyze title and page text
-        text_indicators = {
-            "cart": ["cart", "basket", "your items", "shopping cart", "korzina", "корзина"],
-            "checkout": ["checkout", "payment", "shipping", "оформление", "оплата"],
-            "product": ["buy", "purchase", "add to", "добавить в корзину"],
-            "catalog": ["catalog", "products", "categories", "каталог"],
-        }
+        # Get text content from page
+        page_text = self._extract_text_content(browser_state)
 
-        # Combine title and page text
-        combined_text = title_lower + " " + page_text
+        # Combine title and page text (lowercased once)
+        combined_text = f"{title} {page_text}".lower()
 
         # Check for strongest indicators first
-        for page_type, keywords in text_indicators.items():
-            if any(keyword in combined_text for keyword in keywords):
-                # Count matches for confidence
-                matches = sum(1 for kw in keywords if kw in combined_text)
-                if matches >= 2:  # Need at least 2 matches for confidence
-                    return page_type
+        # (plain `in` is a C substring search - faster than one regex pass here)
+        for page_type, keywords in _TEXT_INDICATORS.items():
+            # Need at least 2 matches for confidence
+            if sum(1 for kw in keywords if kw in combined_text) >= 2:
+                return page_type
 
         # Default: unknown
         return "unknown"
 
-    def _extract_text_content(self, browser_state: Dict[str, Any]) -> str:
-        """Extract text content from browser state."""
-        texts = []
+    def _element_features(self, browser_state: Dict[str, Any]) -> List[_ElementFeatures]:
+        """
+        Get per-element features for browser_state.
 
-        # From interactive elements
+        Built once per browser state and shared by all detectors, so each
+        element's text and classes are extracted and lowercased only once.
+        """
+        if browser_state is self._features_state:
+            return self._features
+
+        features = []
+        append = features.append
+        make = _ElementFeatures
         for elem in browser_state.get("clickable_elements", []):
-            if "text" in elem and elem["text"]:
-                texts.append(elem["text"])
+            attrs = elem.get("attributes", {})
+            text = elem.get("text", "")
+            append(make(
+                text=text,
+                text_lower=text.lower(),
+                aria_label_lower=attrs.get("aria-label", "").lower(),
+                classes=attrs.get("class", "").lower(),
+                attrs=attrs,
+            ))
+
+        self._features_state = browser_state
+        self._features = features
+        return features
 
-        return " ".join(texts)
+    def _extract_text_content(self, browser_state: Dict[str, Any]) -> str:
+        """Extract text content from browser state."""
+        # From interactive elements
+        return " ".join(
+            f.text for f in self._element_features(browser_state) if f.text
+        )
 
     async def _extract_interactive_elements(
         self, browser_state: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
         """Extract and categorize interactive elements."""
         elements = []
+        append = elements.append
+        categorize = self._categorize_element
 
         for elem in browser_state.get("clickable_elements", []):
             elem_info = {
@@ -269,9 +370,9 @@ class PerceptionAgent(AgentBase):
             }
 
             # Categorize by heuristics (NO HARDCODED SELECTORS)
-            elem_info["category"] = self._categorize_element(elem_info)
+            elem_info["category"] = categorize(elem_info)
 
-            elements.append(elem_info)
+            append(elem_info)
 
         return elements
 
@@ -286,9 +387,13 @@ class PerceptionAgent(AgentBase):
         tag = elem.get("tag_name", "").lower()
         classes = attrs.get("class", "").lower()
 
+        # Fast reject: nothing below can match an element without
+        # text, classes or href unless its tag categorizes it
+        if not (text or classes or attrs.get("href")) and tag not in _SELF_CATEGORIZED_TAGS:
+            return "unknown"
+
         # Button indicators
-        button_indicators = ["button", "btn", "click", "tap", "нажать"]
-        if tag == "button" or any(ind in classes for ind in button_indicators):
+        if tag == "button" or _BUTTON_CLASS_RE.search(classes):
             return "button"
 
         # Link indicators
@@ -296,20 +401,15 @@ class PerceptionAgent(AgentBase):
             return "link"
 
         # Input indicators
-        if tag in ["input", "textarea", "select"]:
+        if tag in _INPUT_TAGS:
             return "input"
 
         # Action indicators (add to cart, buy, etc.)
-        action_keywords = [
-            "add", "buy", "purchase", "order", "cart",
-            "добавить", "купить", "заказать", "в корзину",
-        ]
-        if any(kw in text for kw in action_keywords):
+        if _ACTION_TEXT_RE.search(text):
             return "action_button"
 
         # Navigation indicators
-        nav_keywords = ["next", "prev", "back", "forward", "menu", "далее", "назад"]
-        if any(kw in text for kw in nav_keywords):
+        if _NAV_TEXT_RE.search(text):
             return "navigation"
 
         return "unknown"
@@ -325,9 +425,9 @@ class PerceptionAgent(AgentBase):
             return True
 
         # Look for modal patterns in elements
-        for elem in browser_state.get("clickable_elements", []):
-            attrs = elem.get("attributes", {})
-            classes = attrs.get("class", "").lower()
+        modal_class_search = _MODAL_CLASS_RE.search
+        for features in self._element_features(browser_state):
+            attrs = features.attrs
 
             # Semantic HTML
             if attrs.get("role") == "dialog":
@@ -336,8 +436,7 @@ class PerceptionAgent(AgentBase):
                 return True
 
             # Common class patterns
-            modal_patterns = ["modal", "dialog", "popup", "overlay", "lightbox"]
-            if any(pattern in classes for pattern in modal_patterns):
+            if modal_class_search(features.classes):
                 return True
 
         return False
@@ -349,21 +448,13 @@ class PerceptionAgent(AgentBase):
         Uses text patterns and element context.
         """
         # Look for pagination indicators in elements
-        for elem in browser_state.get("clickable_elements", []):
-            text = elem.get("text", "").lower()
-            attrs = elem.get("attributes", {})
-            classes = attrs.get("class", "").lower()
-
+        pagination_text_search = _PAGINATION_TEXT_RE.search
+        for features in self._element_features(browser_state):
             # Common pagination patterns
-            pagination_keywords = [
-                "next", "prev", "previous", "page", "показать ещё",
-                "load more", "следующая", "предыдущая",
-            ]
-
-            if any(kw in text for kw in pagination_keywords):
+            if pagination_text_search(features.text_lower):
                 return True
 
-            if "pagin" in classes:  # pagination, paginate, etc.
+            if "pagin" in features.classes:  # pagination, paginate, etc.
                 return True
 
         return False
@@ -382,9 +473,7 @@ class PerceptionAgent(AgentBase):
 
         return forms
 
-    async def _generate_observations(
-        self, perception: Dict[str, Any], url: str, title: str
-    ) -> List[str]:
+    async def _generate_observations(self, perception: Dict[str, Any]) -> List[str]:
         """Generate natural language observations."""
         observations = []
 
@@ -409,39 +498,68 @@ class PerceptionAgent(AgentBase):
         # Interactive elements count
         elements = perception.get("interactive_elements", [])
         if elements:
-            buttons = [e for e in elements if e.get("category") == "button"]
-            if buttons:
-                observations.append(f"Обнаружено {len(buttons)} кнопок")
+            button_count = sum(1 for e in elements if e.get("category") == "button")
+            if button_count:
+                observations.append(f"Обнаружено {button_count} кнопок")
 
         return observations
 
-    async def detect_patterns(self, browser_state: Dict[str, Any]) -> List[str]:
+    async def detect_patterns(
+        self,
+        browser_state: Dict[str, Any],
+        perception: Optional[Dict[str, Any]] = None,
+    ) -> List[str]:
         """
         Detect patterns on the page (NO HARDCODED SELECTORS).
 
+        Args:
+            browser_state: Current browser state
+            perception: Result of perceive_page() for the same state, if any;
+                its modal/pagination/forms detections are reused
+
         Returns list of detected patterns.
         """
         patterns = []
 
+        if perception is not None:
+            modal = perception["modal_detected"]
+            pagination = perception["pagination_detected"]
+            forms = perception["forms_detected"]
+        else:
+            modal = await self._detect_modal(browser_state)
+            pagination = await self._detect_pagination(browser_state)
+            forms = await self._detect_forms(browser_state)
+
         # Check for common patterns
-        if await self._detect_modal(browser_state):
+        if modal:
             patterns.append("modal_window")
 
-        if await self._detect_pagination(browser_state):
+        if pagination:
             patterns.append("pagination")
 
-        forms = await self._detect_forms(browser_state)
         if forms:
             patterns.append(f"forms ({len(forms)} found)")
 
-        # Detect shopping-specific patterns
-        page_text = self._extract_text_content(browser_state).lower()
-        cart_keywords = ["cart", "basket", "корзина"]
-        if any(kw in page_text for kw in cart_keywords):
+        # Detect shopping-specific patterns on the already lowercased texts
+        # (keywords have no spaces, so no match can span two elements)
+        cart_search = _CART_TEXT_RE.search
+        checkout_search = _CHECKOUT_TEXT_RE.search
+        cart = checkout = False
+        for features in self._element_features(browser_state):
+            text_lower = features.text_lower
+            if not text_lower:
+                continue
+            if not cart and cart_search(text_lower):
+                cart = True
+            if not checkout and checkout_search(text_lower):
+                checkout = True
+            if cart and checkout:
+                break
+
+        if cart:
             patterns.append("shopping_cart_present")
 
-        checkout_keywords = ["checkout", "payment", "оформление", "оплата"]
-        if any(kw in page_text for kw in checkout_keywords):
+        if checkout:
             patterns.append("checkout_flow")
 
         # Detect quantity controls (+/- buttons)
@@ -456,37 +574,34 @@ class PerceptionAgent(AgentBase):
 
         Это наблюдение, а не инструкция! Агент сам решает как использовать.
         """
-        for elem in browser_state.get("clickable_elements", []):
-            text = elem.get("text", "").lower()
-            attrs = elem.get("attributes", {})
-            aria_label = attrs.get("aria-label", "").lower()
-            classes = attrs.get("class", "").lower()
-
-            # Quantity control indicators (эвристики, не хардкод!)
-            quantity_indicators = [
-                "increase", "decrease", "increment", "decrement",
-                "увеличить", "уменьшить", "плюс", "минус",
-                "quantity", "qty", "count", "количество",
-            ]
-
-            # Check text and aria-label
-            if any(ind in text for ind in quantity_indicators):
-                return True
-            if any(ind in aria_label for ind in quantity_indicators):
+        indicators_search = _QUANTITY_INDICATORS_RE.search
+        class_search = _QUANTITY_CLASS_RE.search
+        nav_class_search = _QUANTITY_NAV_CLASS_RE.search
+        symbols = _QUANTITY_SYMBOLS
+        min_len, max_len = _QUANTITY_SYMBOLS_MIN_LEN, _QUANTITY_SYMBOLS_MAX_LEN
+
+        for features in self._element_features(browser_state):
+            text = features.text
+            aria_label_lower = features.aria_label_lower
+            classes = features.classes
+
+            # Fast reject: no text, label or classes to match against
+            if not (text or aria_label_lower or classes):
+                continue
+
+            # Check text and aria-label (both lowercased once per step)
+            if indicators_search(features.text_lower) or indicators_search(aria_label_lower):
                 return True
 
             # Check for common quantity control class patterns
-            quantity_class_patterns = [
-                "quantity", "qty", "counter", "stepper",
-                "amount", "number-spinner", "qty-selector",
-            ]
-            if any(pattern in classes for pattern in quantity_class_patterns):
+            if class_search(classes):
                 return True
 
             # Check for symbol buttons (+, -) but exclude navigation
-            if text.strip() in ["+", "-", "+]", "[-", "(+)", "(-)"]:
+            symbol = text.strip()
+            if min_len <= len(symbol) <= max_len and symbol in symbols:
                 # Verify it's not just a navigation button
-                if not any(nav in classes for nav in ["nav", "menu", "pagination"]):
+                if not nav_class_search(classes):
                     return True
 
         return False
@@ -499,8 +614,6 @@ class PerceptionAgent(AgentBase):
 
         БЕЗ жёстких инструкций - только наблюдения и паттерны!
         """
-        from agent_system.shared_memory import ContextHints
-
         # Observations из perception_data
         observations = list(perception_data.observations)
 
@@ -522,6 +635,9 @@ class PerceptionAgent(AgentBase):
             category = elem.get("category", "")
             if category and category != "unknown":
                 suggested_categories.add(category)
+                # Every category already seen - the rest can't add anything
+                if suggested_categories >= _ELEMENT_CATEGORIES:
+                    break
 
         # Warnings пока пустые (Reflection Agent добавит при необходимости)
         warnings = []
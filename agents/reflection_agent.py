@@ -8,8 +8,11 @@ Reflection Agent - Evaluates progress and decides next steps.
 """
 
 import asyncio
+import re
+import time
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Deque, Dict, List, Optional
 import logging
 
 from agent_system.agent_base import AgentBase, AgentCapability, AgentConfig
@@ -18,11 +21,62 @@ from agent_system.shared_memory import (
     SharedMemory,
     MemoryKey,
     ReflectionData,
+    ReflectionMemento,
     ContextHints,
 )
 
 logger = logging.getLogger(__name__)
 
+# Максимум warnings в ContextHints (в промпт всё равно попадают только первые)
+MAX_CONTEXT_WARNINGS = 10
+
+# Размер истории прогресса и окно для оценки тренда
+PROGRESS_HISTORY_SIZE = 256
+PROGRESS_TREND_WINDOW = 32
+
+# Признаки критических ошибок
+_CRITICAL_RE = re.compile(r"fatal|крит", re.IGNORECASE)
+
+# Тип задачи по ключевым словам
+_SHOPPING_TASK_RE = re.compile("купи|закажи|добавь|buy|order|add")
+_SEARCH_TASK_RE = re.compile("найди|поиск|search|find")
+_NAVIGATION_TASK_RE = re.compile("зайди|открой|go to|open|visit")
+
+# Корректировки по признакам ошибки (проверяются по порядку, первая подходящая)
+_CORRECTION_RULES = (
+    (re.compile("not found|не найден"), "Попробовать найти элемент по другим признакам"),
+    (re.compile("timeout|время"), "Подождать дольше или проверить загрузку страницы"),
+    (re.compile("blocked|заблокирован"), "Проверить модальные окна или перекрывающие элементы"),
+)
+_DEFAULT_CORRECTION = "Проанализировать ситуацию и попробовать альтернативный подход"
+
+# Прогресс покупки по типу страницы
+_SHOP_SCORE = {
+    "catalog": 0.2,
+    "product": 0.4,
+    "cart": 0.6,
+    "checkout": 0.8,
+}
+_COMPLETE_TOKENS = ("completed", "success")
+
+# Следующее действие по типу страницы (средняя и поздняя стадии)
+_MID_ACTION = {
+    "catalog": "Найти нужный товар или категорию",
+    "product": "Добавить товар в корзину или выбрать опции",
+    "cart": "Перейти к оформлению заказа",
+}
+_LATE_ACTION = {
+    "checkout": "Заполнить необходимые данные для оформления",
+}
+
+# page_type -> компактный id для ReflectionMemento
+_PAGE_TYPE_IDS: Dict[str, int] = {}
+
+
+def _intern_page_type(page_type: str) -> int:
+    """Get a stable small integer id for a page type."""
+    return _PAGE_TYPE_IDS.setdefault(page_type, len(_PAGE_TYPE_IDS))
+
 
 # Минималистичный системный промпт для Reflection Agent
 REFLECTION_SYSTEM_PROMPT = """
@@ -68,8 +122,8 @@ class ReflectionAgent(AgentBase):
         self.llm = llm
 
         # Track progress over time
-        self._progress_history: List[float] = []
-        self._action_history: List[Dict[str, Any]] = []
+        self._progress_history: Deque[float] = deque(maxlen=PROGRESS_HISTORY_SIZE)
+        self._action_history: List[ReflectionMemento] = []
 
         # Subscribe to relevant messages
         self._subscribe_to_messages()
@@ -117,18 +171,20 @@ class ReflectionAgent(AgentBase):
         try:
             # Perform reflection
             reflection = await self.reflect_on_action(action_result)
+            reflection_dict = reflection.to_dict()
 
             # Store in shared memory
-            await self.set_memory(MemoryKey.REFLECTION_RESULT, reflection.to_dict())
+            await self.set_memory(MemoryKey.REFLECTION_RESULT, reflection_dict)
             await self.set_memory(MemoryKey.PROGRESS_SCORE, reflection.progress_score)
 
             # Update ContextHints with warnings from reflection
+            # (Perception Agent rewrites hints every step, so always re-apply)
             await self._update_context_hints(reflection, perception)
 
             # Publish reflection result
             await self.send_message(
                 MessageType.REFLECTION_ACTION_EVALUATED,
-                reflection.to_dict(),
+                reflection_dict,
             )
 
             # Publish progress update
@@ -154,7 +210,7 @@ class ReflectionAgent(AgentBase):
 
             return {
                 "success": True,
-                "reflection": reflection.to_dict(),
+                "reflection": reflection_dict,
             }
 
         except Exception as e:
@@ -173,23 +229,23 @@ class ReflectionAgent(AgentBase):
         Returns:
             ReflectionData with evaluation and decisions
         """
-        # Determine if action was successful
-        action_successful = await self._evaluate_action_success(action_result)
-
-        # Determine if progress was made
-        progress_made = await self._evaluate_progress_made(action_result)
+        # Inspect action result once: success flag and errors
+        action_successful, errors = self._inspect_action_result(action_result)
 
-        # Calculate progress score
+        # Calculate progress score (previous score is read before it's recorded)
+        previous_score = self._progress_history[-1] if self._progress_history else 0.0
         progress_score = await self._calculate_progress_score(action_result)
 
+        # Determine if progress was made
+        progress_made = progress_score > previous_score
+
         # Generate next action suggestion
         next_action = await self._decide_next_action(action_result, progress_score)
 
         # Generate reasoning
-        reasoning = await self._generate_reasoning(action_result, progress_made)
-
-        # Check for errors
-        errors = await self._identify_errors(action_result)
+        reasoning = await self._generate_reasoning(
+            action_result, action_successful, progress_made
+        )
 
         # Generate corrections if needed
         suggested_corrections = []
@@ -202,7 +258,7 @@ class ReflectionAgent(AgentBase):
         # Decide whether to correct
         should_correct = len(errors) > 0 and not action_successful
 
-        return ReflectionData(
+        reflection = ReflectionData(
             action_successful=action_successful,
             progress_made=progress_made,
             confidence=await self._calculate_confidence(progress_score),
@@ -215,31 +271,55 @@ class ReflectionAgent(AgentBase):
             progress_score=progress_score,
         )
 
-    async def _evaluate_action_success(self, action_result: Optional[Any]) -> bool:
-        """Evaluate if the action was successful."""
-        if action_result is None:
-            # No action result means we're at the start
-            return True
+        # Keep only a compact snapshot in history
+        perception = self.shared_memory.get(MemoryKey.PERCEPTION_RESULT) or {}
+        self._action_history.append(ReflectionMemento(
+            ts=time.time(),
+            score=progress_score,
+            success=action_successful,
+            page_type=_intern_page_type(perception.get("page_type") or "unknown"),
+            error_hash=hash(tuple(errors)) & 0xFFFFFFFF if errors else 0,
+        ))
+
+        return reflection
+
+    def _inspect_action_result(
+        self, action_result: Optional[Any]
+    ) -> tuple[bool, List[str]]:
+        """
+        Evaluate action success and collect errors in a single pass.
+
+        Returns:
+            (action_successful, errors)
+        """
+        errors = []
 
-        # Check if action_result has success attribute
-        if hasattr(action_result, "success"):
-            return action_result.success
+        if not action_result:
+            # No action result means we're at the start
+            success = True
 
-        # Check if it's a dict with success key
-        if isinstance(action_result, dict):
-            return action_result.get("success", True)
+        elif isinstance(action_result, dict):
+            success = action_result.get("success", True)
+            if action_result.get("error"):
+                errors.append(action_result["error"])
+            if not action_result.get("success"):
+                errors.append("Действие не выполнено")
 
-        # Default to true if no clear failure indicator
-        return True
+        else:
+            # Default to true if no clear failure indicator
+            success = getattr(action_result, "success", True)
+            error = getattr(action_result, "error", None)
+            if error:
+                errors.append(error)
 
-    async def _evaluate_progress_made(self, action_result: Optional[Any]) -> bool:
-        """Evaluate if progress was made toward the goal."""
-        # Get previous and current progress
-        previous_score = self._progress_history[-1] if self._progress_history else 0.0
-        current_score = await self._calculate_progress_score(action_result)
+        # Check for stale state
+        perception = self.shared_memory.get(MemoryKey.PERCEPTION_RESULT)
+        if perception:
+            url = self.shared_memory.get(MemoryKey.CURRENT_URL)
+            if not url or url == "about:blank":
+                errors.append("Нет активной страницы")
 
-        # Progress is made if score increased
-        return current_score > previous_score
+        return success, errors
 
     async def _calculate_progress_score(self, action_result: Optional[Any]) -> float:
         """
@@ -263,31 +343,23 @@ class ReflectionAgent(AgentBase):
         task_lower = task.lower()
 
         # Shopping tasks
-        if any(word in task_lower for word in ["купи", "закажи", "добавь", "buy", "order", "add"]):
+        if _SHOPPING_TASK_RE.search(task_lower):
             # Progress based on page type
-            if page_type == "catalog":
-                score = 0.2
-            elif page_type == "product":
-                score = 0.4
-            elif page_type == "cart":
-                score = 0.6
-            elif page_type == "checkout":
-                score = 0.8
-            elif "completed" in page_type or "success" in page_type:
+            score = _SHOP_SCORE.get(page_type, 0.0)
+            if not score and any(t in page_type for t in _COMPLETE_TOKENS):
                 score = 1.0
 
         # Search tasks
-        elif any(word in task_lower for word in ["найди", "поиск", "search", "find"]):
-            url = self.shared_memory.get(MemoryKey.CURRENT_URL, "")
+        elif _SEARCH_TASK_RE.search(task_lower):
             # If we're on a result page with content
             if perception.get("interactive_elements"):
                 score = 0.5
             # If we found what we're looking for
-            if action_result and hasattr(action_result, "success") and action_result.success:
+            if action_result and getattr(action_result, "success", False):
                 score = 0.8
 
         # Navigation tasks
-        elif any(word in task_lower for word in ["зайди", "открой", "go to", "open", "visit"]):
+        elif _NAVIGATION_TASK_RE.search(task_lower):
             # Success if we navigated to the target
             score = 0.7 if page_type != "unknown" else 0.3
 
@@ -307,7 +379,6 @@ class ReflectionAgent(AgentBase):
         # Get current perception
         perception = self.shared_memory.get(MemoryKey.PERCEPTION_RESULT, {})
         page_type = perception.get("page_type", "unknown")
-        task = self.shared_memory.get(MemoryKey.TASK_DESCRIPTION, "")
 
         # Generate next action based on context
         if progress_score < 0.3:
@@ -318,34 +389,30 @@ class ReflectionAgent(AgentBase):
 
         elif progress_score < 0.7:
             # Middle stage - interact with elements
-            if page_type == "catalog":
-                return "Найти нужный товар или категорию"
-            elif page_type == "product":
-                return "Добавить товар в корзину или выбрать опции"
-            elif page_type == "cart":
-                return "Перейти к оформлению заказа"
-            return "Выполнить следующее действие для продвижения к цели"
+            return _MID_ACTION.get(
+                page_type, "Выполнить следующее действие для продвижения к цели"
+            )
 
         elif progress_score < 1.0:
             # Late stage - finalize
-            if page_type == "checkout":
-                return "Заполнить необходимые данные для оформления"
-            return "Завершить выполнение задачи"
+            return _LATE_ACTION.get(page_type, "Завершить выполнение задачи")
 
         else:
             # Task complete
             return None
 
     async def _generate_reasoning(
-        self, action_result: Optional[Any], progress_made: bool
+        self,
+        action_result: Optional[Any],
+        action_successful: bool,
+        progress_made: bool,
     ) -> str:
         """Generate reasoning for the reflection."""
         reasoning_parts = []
 
         # Action success
         if action_result:
-            success = await self._evaluate_action_success(action_result)
-            if success:
+            if action_successful:
                 reasoning_parts.append("Последнее действие выполнено успешно")
             else:
                 reasoning_parts.append("Последнее действие не принесло результата")
@@ -363,58 +430,23 @@ class ReflectionAgent(AgentBase):
 
         return ". ".join(reasoning_parts) if reasoning_parts else "Продолжаю выполнение задачи"
 
-    async def _identify_errors(self, action_result: Optional[Any]) -> List[str]:
-        """Identify any errors that occurred."""
-        errors = []
-
-        if action_result:
-            # Check for error attribute
-            if hasattr(action_result, "error") and action_result.error:
-                errors.append(action_result.error)
-
-            # Check for error in dict
-            if isinstance(action_result, dict):
-                if action_result.get("error"):
-                    errors.append(action_result["error"])
-                if not action_result.get("success"):
-                    errors.append("Действие не выполнено")
-
-        # Check for stale state
-        perception = self.shared_memory.get(MemoryKey.PERCEPTION_RESULT)
-        if perception:
-            url = self.shared_memory.get(MemoryKey.CURRENT_URL)
-            if not url or url == "about:blank":
-                errors.append("Нет активной страницы")
-
-        return errors
-
     async def _generate_corrections(self, errors: List[str]) -> List[str]:
         """Generate suggested corrections for errors."""
         corrections = []
 
         for error in errors:
             error_lower = error.lower()
-
-            if "not found" in error_lower or "не найден" in error_lower:
-                corrections.append("Попробовать найти элемент по другим признакам")
-
-            elif "timeout" in error_lower or "время" in error_lower:
-                corrections.append("Подождать дольше или проверить загрузку страницы")
-
-            elif "blocked" in error_lower or "заблокирован" in error_lower:
-                corrections.append("Проверить модальные окна или перекрывающие элементы")
-
-            else:
-                corrections.append("Проанализировать ситуацию и попробовать альтернативный подход")
+            corrections.append(next(
+                (fix for pattern, fix in _CORRECTION_RULES if pattern.search(error_lower)),
+                _DEFAULT_CORRECTION,
+            ))
 
         return corrections
 
     async def _calculate_confidence(self, progress_score: float) -> float:
         """Calculate confidence in the current assessment."""
         # Higher progress = higher confidence
-        # Add some uncertainty factor
         base_confidence = progress_score
-        uncertainty = 0.1 if progress_score < 0.5 else 0.05
         return min(base_confidence + (1 - base_confidence) * 0.5, 1.0)
 
     async def should_continue(
@@ -435,8 +467,7 @@ class ReflectionAgent(AgentBase):
             return True
 
         # Continue if no critical errors
-        critical_errors = [e for e in errors if "fatal" in e.lower() or "крит" in e.lower()]
-        if not critical_errors:
+        if not any(_CRITICAL_RE.search(e) for e in errors):
             return True
 
         # Default: continue
@@ -456,7 +487,7 @@ class ReflectionAgent(AgentBase):
         error_history = self.shared_memory.get(MemoryKey.ERROR_HISTORY, [])
         error_history.append({
             "error": error_message,
-            "timestamp": __import__("time").time(),
+            "timestamp": time.time(),
         })
         await self.shared_memory.set(MemoryKey.ERROR_HISTORY, error_history)
 
@@ -478,12 +509,41 @@ class ReflectionAgent(AgentBase):
 
     def get_progress_summary(self) -> Dict[str, Any]:
         """Get summary of progress tracking."""
+        action_count = len(self._action_history)
+        success_count = sum(1 for m in self._action_history if m.success)
+        error_count = sum(1 for m in self._action_history if m.error_hash)
+        average_score = (
+            sum(m.score for m in self._action_history) / action_count
+            if action_count else 0.0
+        )
+
         return {
             "current_score": self._progress_history[-1] if self._progress_history else 0.0,
-            "history": self._progress_history.copy(),
-            "action_count": len(self._action_history),
+            "history": list(self._progress_history),
+            "trend": self.progress_slope(),
+            "action_count": action_count,
+            "success_count": success_count,
+            "error_count": error_count,
+            "average_score": average_score,
         }
 
+    def progress_slope(self) -> float:
+        """
+        Slope of the recent progress scores (least squares).
+
+        Positive when progress is growing, ~0 when stalled.
+        """
+        window = list(self._progress_history)[-PROGRESS_TREND_WINDOW:]
+        n = len(window)
+        if n < 2:
+            return 0.0
+
+        mean_x = (n - 1) / 2
+        mean_y = sum(window) / n
+        cov = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(window))
+        var = sum((x - mean_x) ** 2 for x in range(n))
+        return cov / var
+
     async def _update_context_hints(
         self, reflection: ReflectionData, perception: Optional[Dict[str, Any]] = None
     ) -> None:
@@ -501,10 +561,16 @@ class ReflectionAgent(AgentBase):
 
         # Добавить warnings из reflection
         new_warnings = await self._generate_warnings(reflection, perception)
+        seen_warnings = set(context_hints.warnings)
         for warning in new_warnings:
-            if warning not in context_hints.warnings:
+            if warning not in seen_warnings:
+                seen_warnings.add(warning)
                 context_hints.warnings.append(warning)
 
+        # Ограничить рост warnings в долгих сессиях (оставляем самые свежие)
+        if len(context_hints.warnings) > MAX_CONTEXT_WARNINGS:
+            del context_hints.warnings[:-MAX_CONTEXT_WARNINGS]
+
         # Обновить в shared memory
         await self.set_memory(MemoryKey.CONTEXT_HINTS, context_hints.to_dict())
 
@@ -15,24 +15,38 @@ Browser Agent — AI агент для автоматизации браузер
 
 Использование:
     python main.py "зайди на яндекс еду и закажи пиццу"
+    python main.py --serve                      # браузер и LLM живут между задачами
+    python main.py --connect "найди пиццу"      # задача запущенному агенту
 """
 
+import argparse
 import asyncio
-import io
+import json
 import os
+import secrets
+import signal
 import sys
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 
 # Устанавливаем UTF-8 кодировку для консоли Windows
+# (reconfigure сохраняет существующий буфер, без лишней обёртки на каждый print)
 if sys.platform == "win32":
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
 
 from browser_use import ChatOpenAI
 
+from agent_system.browser_adapter import create_browser_session
 from agent_system.coordinator import create_coordinator, SYSTEM_PROMPT
 
+# Быстрый event loop на libuv (только POSIX); без него - стандартный asyncio
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 load_dotenv()
 
 
@@ -58,18 +72,48 @@ def get_polza_llm(model: str = "openai/gpt-4o", temperature: float = 0.0):
 # MAIN ENTRY POINT
 # =============================================================================
 
+def _enable_eager_tasks() -> None:
+    """Eager tasks (3.12+): корутины, завершающиеся без ожидания, не планируются в loop."""
+    if sys.version_info >= (3, 12):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
+
+async def _wait_for_ctrl_c() -> None:
+    """Ждёт Ctrl+C: SIGINT просто выставляет событие, loop при этом простаивает."""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGINT, stop_event.set)
+    except NotImplementedError:
+        pass  # Windows: Ctrl+C прерывает ожидание исключением
+
+    try:
+        await stop_event.wait()
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        try:
+            loop.remove_signal_handler(signal.SIGINT)
+        except NotImplementedError:
+            pass
+
+
 async def run_task(task: str, model: str = "openai/gpt-4o", headless: bool = False, debug: bool = False):
     """Выполняет задачу с помощью multi-agent системы."""
-    print(f"Запускаю агента с задачей: {task}")
-    print(f"Модель: {model}")
-    print(f"Режим браузера: {'видимый'}")
-    print("-" * 50)
-    print("🧠 Multi-Agent Architecture:")
-    print("   👁️  Perception Agent - анализ страницы и паттернов")
-    print("   🤔 Reflection Agent - оценка прогресса и принятие решений")
-    print("   🔗 Sequential Thinking - пошаговое мышление")
-    print("   🤖 browser-use Agent - выполнение действий")
-    print("-" * 50)
+    _enable_eager_tasks()
+
+    print("\n".join([
+        f"Запускаю агента с задачей: {task}",
+        f"Модель: {model}",
+        f"Режим браузера: {'видимый'}",
+        "-" * 50,
+        "🧠 Multi-Agent Architecture:",
+        "   👁️  Perception Agent - анализ страницы и паттернов",
+        "   🤔 Reflection Agent - оценка прогресса и принятие решений",
+        "   🔗 Sequential Thinking - пошаговое мышление",
+        "   🤖 browser-use Agent - выполнение действий",
+        "-" * 50,
+    ]))
 
     llm = get_polza_llm(model=model)
 
@@ -85,15 +129,16 @@ async def run_task(task: str, model: str = "openai/gpt-4o", headless: bool = Fal
         # Run the task
         result = await coordinator.run_with_agents(task)
 
-        print("-" * 50)
-        print("✅ Задача выполнена!")
-        print(f"Результат: {result}")
-
-        # Print stats
+        # Print result and stats
         stats = coordinator.get_stats()
-        print(f"\n📊 Статистика:")
-        print(f"  Шагов выполнено: {stats['steps']}")
-        print(f"  Прогресс: {stats['progress']*100:.0f}%")
+        print("\n".join([
+            "-" * 50,
+            "✅ Задача выполнена!",
+            f"Результат: {result}",
+            "\n📊 Статистика:",
+            f"  Шагов выполнено: {stats['steps']}",
+            f"  Прогресс: {stats['progress']*100:.0f}%",
+        ]))
 
         return result
 
@@ -104,82 +149,241 @@ async def run_task(task: str, model: str = "openai/gpt-4o", headless: bool = Fal
         raise
     finally:
         # Keep browser open for user
-        print("\n" + "=" * 60)
-        print("🔵 БРАУЗЕР ОСТАЁТСЯ ОТКРЫТЫМ")
-        print("=" * 60)
-        print("Вы можете:")
-        print("  - Продолжить работу в браузере вручную")
-        print("  - Нажать Ctrl+C чтобы закрыть браузер и выйти")
-        print("=" * 60)
+        print("\n".join([
+            "\n" + "=" * 60,
+            "🔵 БРАУЗЕР ОСТАЁТСЯ ОТКРЫТЫМ",
+            "=" * 60,
+            "Вы можете:",
+            "  - Продолжить работу в браузере вручную",
+            "  - Нажать Ctrl+C чтобы закрыть браузер и выйти",
+            "=" * 60,
+        ]))
+
+        await _wait_for_ctrl_c()
+
+        print("\n🛑 Закрытие браузера по запросу пользователя...")
+        # Browser is kept alive, user can close it manually
+        print("✅ Выход выполнен")
+
+
+# =============================================================================
+# DAEMON MODE: один браузер и LLM клиент на много задач
+# =============================================================================
+
+# POSIX: Unix-сокет с правами 0600 (недоступен браузеру и другим пользователям).
+# Windows: TCP на localhost + токен демона из файла, который читает только клиент.
+_USE_UNIX_SOCKET = sys.platform != "win32"
+_DAEMON_DIR = Path.home() / ".browser-agent"
+_DAEMON_SOCKET = _DAEMON_DIR / "agent.sock"
+_DAEMON_TOKEN_FILE = _DAEMON_DIR / "agent.token"
+
+
+def _parse_request(line: bytes, token: Optional[str]) -> Optional[str]:
+    """Задача из строки запроса или None, если строка не от нашего клиента."""
+    try:
+        request = json.loads(line)
+        task = request["task"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    if not isinstance(task, str) or not task:
+        return None
+
+    if token is not None:
+        request_token = request.get("token")
+        if not isinstance(request_token, str) or not secrets.compare_digest(
+            request_token.encode("utf-8"), token.encode("utf-8")
+        ):
+            return None
+
+    return task
+
 
+async def _handle_client(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    llm,
+    browser_session,
+    lock: asyncio.Lock,
+    token: Optional[str],
+    debug: bool,
+) -> None:
+    """Обрабатывает задачи клиента: одна JSON-строка {"task": "..."} на задачу."""
+    try:
+        while line := await reader.readline():
+            task = _parse_request(line, token)
+            if task is None:
+                # Не наш протокол (например, HTTP-запрос из браузера) -
+                # закрываем соединение, не читая дальше
+                break
+
+            # Один браузер - задачи выполняются по очереди
+            async with lock:
+                print(f"\n📥 Задача: {task}")
+                # Новый координатор (чистая память агентов), тот же браузер и LLM
+                coordinator = await create_coordinator(
+                    llm=llm,
+                    max_steps=25,
+                    debug=debug,
+                    browser_session=browser_session,
+                )
+                try:
+                    result = await coordinator.run_with_agents(task)
+                    response = {"success": True, "result": result, "stats": coordinator.get_stats()}
+                except Exception as e:
+                    response = {"success": False, "error": str(e)}
+
+            writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(port: int, model: str = "openai/gpt-4o", headless: bool = False, debug: bool = False):
+    """Держит браузер и LLM клиент между задачами и принимает задачи локально."""
+    _enable_eager_tasks()
+
+    llm = get_polza_llm(model=model)
+    browser_session = await create_browser_session(headless=headless, keep_alive=True)
+    lock = asyncio.Lock()
+    _DAEMON_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+    if _USE_UNIX_SOCKET:
+        token = None
+        # umask вместо chmod после bind: сокет ни на миг не доступен другим
+        old_umask = os.umask(0o177)
         try:
-            await asyncio.Event().wait()
-        except KeyboardInterrupt:
-            print("\n🛑 Закрытие браузера по запросу пользователя...")
-            # Browser is kept alive, user can close it manually
-            print("✅ Выход выполнен")
+            server = await asyncio.start_unix_server(
+                lambda reader, writer: _handle_client(reader, writer, llm, browser_session, lock, token, debug),
+                path=str(_DAEMON_SOCKET),
+            )
+        finally:
+            os.umask(old_umask)
+        address = str(_DAEMON_SOCKET)
+    else:
+        token = secrets.token_urlsafe(32)
+        fd = os.open(_DAEMON_TOKEN_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(token)
+        server = await asyncio.start_server(
+            lambda reader, writer: _handle_client(reader, writer, llm, browser_session, lock, token, debug),
+            "127.0.0.1",
+            port,
+        )
+        address = f"127.0.0.1:{port}"
+
+    print("\n".join([
+        f"🛰️  Агент ждёт задачи на {address} (модель: {model})",
+        "   python main.py --connect \"твоя задача\"",
+        "   Ctrl+C - остановить",
+    ]))
+
+    try:
+        async with server:
+            await _wait_for_ctrl_c()
+    finally:
+        leftover = _DAEMON_SOCKET if _USE_UNIX_SOCKET else _DAEMON_TOKEN_FILE
+        leftover.unlink(missing_ok=True)
+
+    print("\n🛑 Сервер остановлен")
+
+
+async def send_task(task: str, port: int) -> bool:
+    """Отправляет задачу запущенному агенту (--serve) и печатает результат."""
+    request = {"task": task}
+    try:
+        if _USE_UNIX_SOCKET:
+            reader, writer = await asyncio.open_unix_connection(str(_DAEMON_SOCKET))
+        else:
+            request["token"] = _DAEMON_TOKEN_FILE.read_text().strip()
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    except OSError:
+        print("Агент не запущен (python main.py --serve)")
+        return False
+
+    writer.write((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+    await writer.drain()
+    response = json.loads(await reader.readline() or b"{}")
+    writer.close()
+    await writer.wait_closed()
+
+    if not response.get("success"):
+        print(f"\n⚠️  Ошибка: {response.get('error', 'нет ответа от агента')}")
+        return False
+
+    stats = response.get("stats", {})
+    print("\n".join([
+        "✅ Задача выполнена!",
+        f"Результат: {response.get('result')}",
+        "\n📊 Статистика:",
+        f"  Шагов выполнено: {stats.get('steps', 0)}",
+        f"  Прогресс: {stats.get('progress', 0.0)*100:.0f}%",
+    ]))
+    return True
 
 
 def main():
     """Точка входа для CLI."""
     if len(sys.argv) < 2:
-        print("Browser Agent — AI агент для браузера")
-        print("")
-        print("🧠 Multi-Agent Architecture:")
-        print("  - Perception Agent: анализ страницы и паттернов")
-        print("  - Reflection Agent: оценка прогресса и принятие решений")
-        print("  - Sequential Thinking: пошаговое мышление")
-        print("  - browser-use Agent: выполнение действий")
-        print("")
-        print("КРИТИЧЕСКИЕ ПРИНЦИПЫ:")
-        print("  - NO хардкод селекторов")
-        print("  - NO жёстких инструкций")
-        print("  - Минималистичные промпты")
-        print("  - Автономное выполнение")
-        print("")
-        print("Использование:")
-        print("  python main.py \"твоя задача\"")
-        print("")
-        print("Примеры:")
-        print("  python main.py \"зайди на самокат и найди сэндвич\"")
-        print("  python main.py \"найди пиццу на яндекс еде и добавь в корзину\"")
-        print("  python main.py \"оформи сэндвич с курицей\"")
-        print("")
-        print("Опции:")
-        print("  --model MODEL    Модель LLM (default: openai/gpt-4o)")
-        print("  --headless       Фоновый режим браузера")
-        print("  --debug          Режим отладки (verbose output)")
+        print("\n".join([
+            "Browser Agent — AI агент для браузера",
+            "",
+            "🧠 Multi-Agent Architecture:",
+            "  - Perception Agent: анализ страницы и паттернов",
+            "  - Reflection Agent: оценка прогресса и принятие решений",
+            "  - Sequential Thinking: пошаговое мышление",
+            "  - browser-use Agent: выполнение действий",
+            "",
+            "КРИТИЧЕСКИЕ ПРИНЦИПЫ:",
+            "  - NO хардкод селекторов",
+            "  - NO жёстких инструкций",
+            "  - Минималистичные промпты",
+            "  - Автономное выполнение",
+            "",
+            "Использование:",
+            "  python main.py \"твоя задача\"",
+            "",
+            "Примеры:",
+            "  python main.py \"зайди на самокат и найди сэндвич\"",
+            "  python main.py \"найди пиццу на яндекс еде и добавь в корзину\"",
+            "  python main.py \"оформи сэндвич с курицей\"",
+            "",
+            "Опции:",
+            "  --model MODEL    Модель LLM (default: openai/gpt-4o)",
+            "  --headless       Фоновый режим браузера",
+            "  --debug          Режим отладки (verbose output)",
+            "  --serve          Держать браузер открытым и принимать задачи",
+            "  --connect        Отправить задачу запущенному агенту (--serve)",
+            "  --port PORT      TCP-порт для --serve/--connect на Windows (default: 8765)",
+        ]))
         sys.exit(1)
 
-    task = None
-    model = "openai/gpt-4o"
-    headless = False
-    debug = False
-
-    i = 1
-    while i < len(sys.argv):
-        arg = sys.argv[i]
-        if arg == "--model" and i + 1 < len(sys.argv):
-            model = sys.argv[i + 1]
-            i += 2
-        elif arg == "--headless":
-            headless = True
-            i += 1
-        elif arg == "--debug":
-            debug = True
-            i += 1
-        elif arg.startswith("--"):
-            print(f"Неизвестная опция: {arg}")
-            sys.exit(1)
-        else:
-            task = arg
-            i += 1
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Browser Agent — AI агент для браузера",
+    )
+    parser.add_argument("task", nargs="?", help="Задача для агента")
+    parser.add_argument("--model", default="openai/gpt-4o", help="Модель LLM (default: openai/gpt-4o)")
+    parser.add_argument("--headless", action="store_true", help="Фоновый режим браузера")
+    parser.add_argument("--debug", action="store_true", help="Режим отладки (verbose output)")
+    parser.add_argument("--serve", action="store_true", help="Держать браузер открытым и принимать задачи")
+    parser.add_argument("--connect", action="store_true", help="Отправить задачу запущенному агенту (--serve)")
+    parser.add_argument("--port", type=int, default=8765, help="TCP-порт для --serve/--connect на Windows (default: 8765)")
+    args = parser.parse_args()
 
-    if not task:
+    if not args.task and not args.serve:
         print("Не указана задача")
         sys.exit(1)
 
-    asyncio.run(run_task(task, model=model, headless=headless, debug=debug))
+    loop_factory = uvloop.new_event_loop if uvloop is not None else None
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        if args.serve:
+            runner.run(serve(args.port, model=args.model, headless=args.headless, debug=args.debug))
+        elif args.connect:
+            if not runner.run(send_task(args.task, args.port)):
+                sys.exit(1)
+        else:
+            runner.run(run_task(args.task, model=args.model, headless=args.headless, debug=args.debug))
 
 
 if __name__ == "__main__":